@@ -1,32 +1,14 @@
-import serial
 import time
-from typing import Optional
+from typing import Dict
 
-class VoltageSettings:
-    def __init__(self, port='/dev/ttyUSB0', baudrate=2400):
-        self.ser = serial.Serial(
-            port=port,
-            baudrate=baudrate,
-            bytesize=serial.EIGHTBITS,
-            parity=serial.PARITY_NONE,
-            stopbits=serial.STOPBITS_ONE,
-            timeout=0.5
-        )
-        
-    def _calculate_checksum(self, data: bytes) -> int:
-        """Calculate checksum for frame."""
-        return (256 - sum(data) % 256) % 256
+from ve_bus import VEBus
 
-    def _send_command(self, data: bytes) -> Optional[bytes]:
-        """Send command and read response."""
-        print(f"Sending: {data.hex()}")
-        self.ser.write(data)
+class VoltageSettings:
+    def __init__(self, port='/dev/ttyUSB0', baudrate=2400, debug=False):
+        self.bus = VEBus(port, baudrate, debug=debug)
+        # Set the address once; it stays selected for all later writes
+        self.bus.set_address()
         time.sleep(0.1)
-        if self.ser.in_waiting:
-            response = self.ser.read(self.ser.in_waiting)
-            print(f"Response: {response.hex()}")
-            return response
-        return None
 
     def set_voltage(self, voltage: float, setting_id: int) -> bool:
         """
@@ -34,34 +16,30 @@ class VoltageSettings:
         voltage: target voltage (e.g., 56.0 for 56.0V)
         setting_id: 2 for absorption, 3 for float
         """
-        # First set address
-        addr_cmd = bytes([0x04, 0xFF, 0x41, 0x01, 0x00, 0xBB])
-        self._send_command(addr_cmd)
-        time.sleep(0.1)
-        
         # Convert voltage to internal format (multiply by 100 for 0.01V scale)
         value = int(voltage * 100)
-        value_bytes = value.to_bytes(2, byteorder='little')
-        
-        # Construct the write command
-        write_cmd = bytes([
-            0x07,           # Length
-            0xFF,           # Protocol marker
-            0x58,           # 'X' command (ascii)
-            0x37,           # CommandWriteViaID
-            0x01,           # Flags (RAM only)
-            setting_id,     # Setting ID (2=absorption, 3=float)
-        ]) + value_bytes
-        
-        # Add checksum
-        write_cmd += bytes([self._calculate_checksum(write_cmd)])
         
         # Send command
-        response = self._send_command(write_cmd)
+        response = self.bus.write_setting(setting_id, value)
         return response is not None
 
+    def set_voltages(self, mapping: Dict[int, float]) -> Dict[int, bool]:
+        """
+        Set several voltages with all writes sent back-to-back.
+        mapping: setting_id -> target voltage (e.g., {2: 56.0, 3: 54.0})
+        Returns setting_id -> whether the device responded. Acks do not name
+        the setting they belong to, so unless every write is acknowledged
+        all settings are reported as failed.
+        """
+        if not mapping:
+            return {}
+        writes = [(setting_id, int(voltage * 100)) for setting_id, voltage in mapping.items()]
+        responses = self.bus.write_settings(writes)
+        return {setting_id: response is not None
+                for (setting_id, _), response in zip(writes, responses)}
+
     def close(self):
-        self.ser.close()
+        self.bus.close()
 
 if __name__ == "__main__":
     try:
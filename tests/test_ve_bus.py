@@ -0,0 +1,174 @@
+import random
+import threading
+
+import serial
+
+from ve_bus import ADDR_CMD, FrameParser, VEBus
+
+WRITE_ACK = bytes([0x03, 0xFF, 0x58, 0x87, 0x1F])
+# Valid frame containing 02 FF 00 FF, which sums to 0 mod 256 but is not a frame
+NESTED_FRAME = bytes.fromhex('0aff5602ff00ffff64ffff40')
+
+def test_next_frame_returns_valid_frame():
+    parser = FrameParser()
+    parser.feed(ADDR_CMD)
+    assert parser.next_frame() == ADDR_CMD
+    assert parser.next_frame() is None
+
+def test_next_frame_waits_for_incomplete_frame():
+    parser = FrameParser()
+    parser.feed(ADDR_CMD[:3])
+    assert parser.next_frame() is None
+    parser.feed(ADDR_CMD[3:])
+    assert parser.next_frame() == ADDR_CMD
+
+def test_next_frame_skips_bad_checksum():
+    parser = FrameParser()
+    parser.feed(WRITE_ACK[:-1] + b'\x00' + WRITE_ACK)
+    assert parser.next_frame() == WRITE_ACK
+
+def test_next_frame_not_blocked_by_false_header():
+    # FF FF (e.g. from a 0xFFFF value) announces a 257-byte frame that never arrives
+    parser = FrameParser()
+    parser.feed(b'\xff\xff\x12' + ADDR_CMD)
+    assert parser.next_frame() == ADDR_CMD
+
+def test_next_frame_keeps_frame_arriving_in_chunks():
+    for size in range(1, 5):
+        parser = FrameParser()
+        frames = []
+        for start in range(0, len(NESTED_FRAME), size):
+            parser.feed(NESTED_FRAME[start:start + size])
+            frames.extend(parser.drain())
+        assert frames == [NESTED_FRAME]
+
+def test_drain_random_chunks():
+    stream = WRITE_ACK + b'\xff\xff' + NESTED_FRAME + ADDR_CMD
+    rng = random.Random(0)
+    for _ in range(200):
+        parser = FrameParser()
+        frames = []
+        start = 0
+        while start < len(stream):
+            size = rng.randint(1, 4)
+            parser.feed(stream[start:start + size])
+            frames.extend(parser.drain())
+            start += size
+        assert frames == [WRITE_ACK, NESTED_FRAME, ADDR_CMD]
+
+def test_drain_yields_all_frames():
+    parser = FrameParser()
+    parser.feed(WRITE_ACK + b'\x00' + ADDR_CMD + WRITE_ACK[:2])
+    assert list(parser.drain()) == [WRITE_ACK, ADDR_CMD]
+    parser.feed(WRITE_ACK[2:])
+    assert list(parser.drain()) == [WRITE_ACK]
+
+class FakePort:
+    """Stands in for serial.Serial; answers each frame written with reply(frame)."""
+    def __init__(self, port, baudrate, timeout, reply, delay=0.04, **kwargs):
+        self.name = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.reply = reply
+        self.delay = delay
+        self.rx = bytearray()
+        self.cond = threading.Condition()
+        self.closed = False
+
+    @property
+    def in_waiting(self):
+        with self.cond:
+            return len(self.rx)
+
+    def inject(self, data):
+        with self.cond:
+            self.rx += data
+            self.cond.notify_all()
+
+    def write(self, data):
+        data = bytes(data)
+        i = 0
+        while i < len(data):
+            frame = data[i:i + data[i] + 2]
+            i += len(frame)
+            reply = self.reply(frame)
+            if reply is not None:
+                threading.Timer(self.delay, self.inject, (reply,)).start()
+        return len(data)
+
+    def read(self, size):
+        with self.cond:
+            # Like pyserial: block until size bytes arrive or the timeout expires
+            self.cond.wait_for(lambda: len(self.rx) >= size or self.closed, self.timeout)
+            if self.closed:
+                raise serial.SerialException('closed')
+            data = bytes(self.rx[:size])
+            del self.rx[:size]
+            return data
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+def make_bus(monkeypatch, reply, **kwargs):
+    monkeypatch.setattr(serial, 'Serial',
+                        lambda **kw: FakePort(reply=reply, **kwargs, **kw))
+    return VEBus('/dev/fake')
+
+def reply_by_command(frame):
+    return {0x41: ADDR_CMD, 0x58: WRITE_ACK}.get(frame[2])
+
+def test_send_command_ignores_stray_bytes(monkeypatch):
+    bus = make_bus(monkeypatch, reply_by_command)
+    try:
+        bus.ser.inject(b'\xbb')
+        assert bus.set_address() == ADDR_CMD
+    finally:
+        bus.close()
+
+def test_late_ack_not_taken_for_next_write(monkeypatch):
+    # The first write's ack arrives after its deadline; the second gets none
+    bus = make_bus(monkeypatch, lambda frame: None)
+    try:
+        threading.Timer(0.25, bus.ser.inject, (WRITE_ACK,)).start()
+        assert bus.write_setting(2, 5580) is None
+        assert bus.write_setting(3, 5380) is None
+    finally:
+        bus.close()
+
+def test_write_settings_ignores_other_commands(monkeypatch):
+    bus = make_bus(monkeypatch, reply_by_command)
+    try:
+        bus.ser.inject(ADDR_CMD)
+        # An unsolicited frame arriving mid-batch is not taken as an ack
+        threading.Timer(0.02, bus.ser.inject, (ADDR_CMD,)).start()
+        assert bus.write_settings([(2, 5580), (3, 5380)]) == [WRITE_ACK, WRITE_ACK]
+    finally:
+        bus.close()
+
+def test_write_settings_partial_acks_are_not_attributed(monkeypatch):
+    # Only the second write is acknowledged
+    bus = make_bus(monkeypatch, lambda frame: WRITE_ACK if frame[5] == 3 else None)
+    try:
+        assert bus.write_settings([(2, 5580), (3, 5380)]) == [None, None]
+    finally:
+        bus.close()
+
+def test_write_settings_deadline_scales_with_count(monkeypatch):
+    # Acks arrive 100 ms apart, the last one after a single response_timeout
+    bus = make_bus(monkeypatch, lambda frame: None)
+    try:
+        writes = [(setting_id, 5400) for setting_id in range(4)]
+        for n in range(len(writes)):
+            threading.Timer(0.1 * (n + 1), bus.ser.inject, (WRITE_ACK,)).start()
+        assert bus.write_settings(writes) == [WRITE_ACK] * len(writes)
+    finally:
+        bus.close()
+
+def test_write_settings_empty(monkeypatch):
+    bus = make_bus(monkeypatch, reply_by_command)
+    try:
+        assert bus.write_settings([]) == []
+    finally:
+        bus.close()
@@ -0,0 +1,226 @@
+import os
+import queue
+import serial
+import struct
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Set address 0 (the checksum 0xBB is part of the constant frame)
+ADDR_CMD = bytes([0x04, 0xFF, 0x41, 0x01, 0x00, 0xBB])
+
+# Constant head of every CommandWriteViaID frame; only the setting ID and
+# value vary, so the prefix sum is computed once for the checksum.
+_WRITE_PREFIX = bytes([
+    0x07,           # Length
+    0xFF,           # Protocol marker
+    0x58,           # 'X' command (ascii)
+    0x37,           # CommandWriteViaID
+    0x01,           # Flags (RAM only)
+])
+_WRITE_PREFIX_SUM = sum(_WRITE_PREFIX)
+
+# Little endian 16-bit value as used by all VE.Bus settings
+_UINT16_LE = struct.Struct('<H')
+
+_WRITE_FRAME_LEN = len(_WRITE_PREFIX) + 4
+
+def _fill_write(buf: bytearray, offset: int, setting_id: int, value: int):
+    """Place a complete CommandWriteViaID frame into buf at offset."""
+    buf[offset:offset + len(_WRITE_PREFIX)] = _WRITE_PREFIX
+    _UINT16_LE.pack_into(buf, offset + 6, value)
+    buf[offset + 5] = setting_id
+    buf[offset + 8] = (256 - (_WRITE_PREFIX_SUM + setting_id + buf[offset + 6] + buf[offset + 7]) % 256) % 256
+
+# Replies from the MK3 are short; a length byte above this is a false header
+# (e.g. the FF FF of a 0xFFFF value) rather than a frame still arriving
+_MAX_FRAME_LENGTH = 0x20
+
+class FrameParser:
+    """
+    Incremental parser for frames of the form [length] 0xFF [command] ... [checksum].
+    Received bytes are appended with feed(); next_frame() scans forward from
+    the last consumed position instead of rescanning the whole buffer.
+    """
+    def __init__(self):
+        self.buf = bytearray()
+        self.pos = 0
+
+    def feed(self, chunk: bytes):
+        self.buf += chunk
+
+    def next_frame(self) -> Optional[bytes]:
+        """Return the next checksum-valid frame, or None."""
+        buf = self.buf
+        end = len(buf)
+        i = self.pos
+        frame = None
+        with memoryview(buf) as view:
+            while i + 2 < end:
+                length = buf[i]
+                if 2 <= length <= _MAX_FRAME_LENGTH and buf[i + 1] == 0xFF:
+                    frame_end = i + length + 2
+                    if frame_end > end:
+                        # Candidate not fully received yet
+                        break
+                    # The checksum makes the whole frame sum to 0 mod 256, so
+                    # one pass over it validates the candidate
+                    if sum(view[i:frame_end]) & 0xFF == 0:
+                        frame = bytes(view[i:frame_end])
+                        i = frame_end
+                        break
+                i += 1
+        self.pos = i
+        # Drop consumed bytes once they make up most of the buffer
+        if self.pos and self.pos * 2 >= len(buf):
+            del buf[:self.pos]
+            self.pos = 0
+        return frame
+
+    def drain(self) -> Iterator[bytes]:
+        """Yield every complete frame currently in the buffer."""
+        frame = self.next_frame()
+        while frame is not None:
+            yield frame
+            frame = self.next_frame()
+
+class _ReaderThread(threading.Thread):
+    """Reads raw bytes continuously; the parser finds the frames, which are queued."""
+    def __init__(self, bus: 'VEBus'):
+        super().__init__(daemon=True)
+        self.bus = bus
+        self.frames = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        parser = self.bus._parser
+        ser = self.bus.ser
+        while not self._stop_event.is_set():
+            try:
+                # Whatever is buffered, or block (up to the port timeout, so
+                # stop() is noticed) for the next byte
+                data = ser.read(ser.in_waiting or 1)
+            except serial.SerialException:
+                # Port closed or unplugged
+                break
+            if not data:
+                continue
+            parser.feed(data)
+            for frame in parser.drain():
+                self.frames.put(frame)
+
+    def stop(self):
+        self._stop_event.set()
+
+class VEBus:
+    """MK3-USB connection to a VE.Bus device."""
+    def __init__(self, port='/dev/ttyUSB0', baudrate=2400, debug=False):
+        self.debug = debug
+        self.ser = serial.Serial(
+            port=port,
+            baudrate=baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            # Only bounds how long the reader thread blocks between polls
+            timeout=0.05
+        )
+        self._parser = FrameParser()
+        self._enable_low_latency()
+        self._set_latency_timer(1)
+        # Seconds send_command waits for each expected response frame
+        self.response_timeout = 0.15
+        # Set when an exchange timed out; its replies may still arrive late
+        self._unanswered = False
+        # Reused CommandWriteViaID frame; write_setting fills in ID, value
+        # and checksum in place
+        self._tx = bytearray(_WRITE_FRAME_LEN)
+        self._reader = _ReaderThread(self)
+        self._reader.start()
+        
+    def _enable_low_latency(self):
+        """Ask the driver to hand received bytes over immediately (ASYNC_LOW_LATENCY)."""
+        try:
+            self.ser.set_low_latency_mode(True)
+        except (AttributeError, ValueError, OSError):
+            # Not Linux, or the driver does not support the flag
+            pass
+
+    def _set_latency_timer(self, ms: int):
+        """Lower the FTDI latency timer (default 16 ms) of the MK3-USB."""
+        # /dev/ttyUSB0 (or a udev symlink to it) -> ttyUSB0
+        tty = os.path.basename(os.path.realpath(self.ser.name))
+        path = f"/sys/bus/usb-serial/devices/{tty}/latency_timer"
+        try:
+            with open(path, 'w') as f:
+                f.write(str(ms))
+        except OSError:
+            # Not an FTDI/usb-serial port, or no permission to write sysfs
+            pass
+
+    def send_command(self, data: bytes) -> Optional[bytes]:
+        """Send command and read response."""
+        return self.send_commands(data, 1)[0]
+
+    def send_commands(self, data: bytes, count: int) -> List[Optional[bytes]]:
+        """
+        Send count concatenated commands (all of the same command, e.g. 'X')
+        in one write and collect their replies. Only frames carrying that
+        command byte count as replies, so unsolicited frames are ignored.
+        Replies hold no request identifier and are matched first-in
+        first-out; if fewer than count arrive before the deadline they
+        cannot be attributed and every entry is None.
+        """
+        if count == 0:
+            return []
+        if self.debug:
+            print(f"Sending: {data.hex()}")
+        command = data[2]
+        # Drop anything left over from a previous exchange. If that exchange
+        # timed out, first give its late replies response_timeout to arrive
+        # so they are not taken for replies to this one.
+        if self._unanswered:
+            time.sleep(self.response_timeout)
+            self._unanswered = False
+        frames = self._reader.frames
+        while not frames.empty():
+            frames.get_nowait()
+        self.ser.write(data)
+
+        # Wire time of the whole batch plus response_timeout per expected reply
+        deadline = (time.monotonic() + len(data) * 10 / self.ser.baudrate
+                    + self.response_timeout * count)
+        responses = []
+        while len(responses) < count:
+            try:
+                response = frames.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._unanswered = True
+                return [None] * count
+            if self.debug:
+                print(f"Response: {response.hex()}")
+            if response[2] == command:
+                responses.append(response)
+        return responses
+
+    def set_address(self) -> Optional[bytes]:
+        """Select address 0; required before sending X commands."""
+        return self.send_command(ADDR_CMD)
+
+    def write_setting(self, setting_id: int, value: int) -> Optional[bytes]:
+        """Write a 16-bit value to RAM with CommandWriteViaID."""
+        _fill_write(self._tx, 0, setting_id, value)
+        return self.send_command(self._tx)
+
+    def write_settings(self, writes: Iterable[Tuple[int, int]]) -> List[Optional[bytes]]:
+        """Write several (setting_id, value) pairs back-to-back; responses in the same order."""
+        writes = list(writes)
+        batch = bytearray(_WRITE_FRAME_LEN * len(writes))
+        for n, (setting_id, value) in enumerate(writes):
+            _fill_write(batch, n * _WRITE_FRAME_LEN, setting_id, value)
+        return self.send_commands(batch, len(writes))
+
+    def close(self):
+        self._reader.stop()
+        self._reader.join()
+        self.ser.close()